@@ -6,6 +6,6 @@ tools that can be used by the agent. See docs/LOCAL_AGENT.md for details.
 """
 
 from .core import Agent
-from .llm_backend import LLMBackend, OllamaBackend
+from .llm_backend import LLMBackend, OllamaBackend, create_session
 
-__all__ = ["Agent", "LLMBackend", "OllamaBackend"]
\ No newline at end of file
+__all__ = ["Agent", "LLMBackend", "OllamaBackend", "create_session"]
\ No newline at end of file
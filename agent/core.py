@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import importlib
-import json
 import logging
 import os
+import re
+import threading
+from contextlib import closing
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
+import orjson
 import yaml
 
 from .llm_backend import LLMBackend
@@ -14,30 +19,111 @@ from agent.tools import Tool  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+_loads = orjson.loads
+
+def _dumps(obj: Any) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def _config_cache_path(path: str) -> str:
+    # Kept in the user cache dir, keyed by the config's absolute path: a cache next to the
+    # YAML would sit inside the repository that file_search scans.
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8"), usedforsecurity=False).hexdigest()[:16]
+    base = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, "local_agent", f"{base}-{digest}.json")
+
+def _read_config(path: str) -> Dict[str, Any]:
+    """Load a YAML config, reusing a JSON cache of it while the YAML is unchanged."""
+    st = os.stat(path)
+    # mtime alone misses edits within one tick of a coarse filesystem clock; the size and
+    # inode (editors that save by rename) catch most of those.
+    key = [st.st_mtime_ns, st.st_size, st.st_ino]
+    cache_path = _config_cache_path(path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = orjson.loads(f.read())
+        if cached["key"] == key:
+            return cached["config"]
+    except (OSError, ValueError, KeyError, TypeError):  # missing, stale format or corrupt cache
+        pass
+    with open(path, "r", encoding="utf-8") as f:
+        config = yaml.load(f, Loader=_YAML_LOADER) or {}
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps({"key": key, "config": config}, option=orjson.OPT_NON_STR_KEYS))
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError) as e:  # unwritable cache dir or non-JSON values: just skip caching
+        logger.debug("Not caching %s: %s", path, e)
+    return config
+
+@functools.lru_cache(maxsize=None)
+def _resolve_tool_cls(module_name: str, class_name: str) -> type:
+    return getattr(importlib.import_module(module_name), class_name)
+
+@functools.lru_cache(maxsize=None)
+def _shared_tool(cls: type) -> Tool:
+    """Tools keep no per-agent state, so every Agent shares one instance per class."""
+    return cls()
+
+_STRUCTURAL_RE = re.compile(r'[{}"\\]')
+
+def _match_brace(text: str, start: int) -> int:
+    """Return the index of the ``}`` closing the object opened at ``text[start]``, or -1."""
+    depth = 0
+    in_string = False
+    pos = start
+    while True:
+        m = _STRUCTURAL_RE.search(text, pos)
+        if m is None:
+            return -1
+        ch = m.group()
+        pos = m.end()
+        if ch == "\\":
+            pos += 1  # skip the escaped character
+        elif ch == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif ch == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.start()
+
 @dataclass
 class Agent:
     """Local AI agent orchestrating an LLM and a set of tools."""
     backend: LLMBackend
-    tools_config: str = "agent/config/tools.yaml"
+    # None skips loading tools altogether (no YAML parse, no tool module imports)
+    tools_config: Optional[str] = "agent/config/tools.yaml"
     history: List[Dict[str, str]] = field(default_factory=list)
+    # Messages kept in history (None = unbounded); the whole history is resent every turn.
+    max_history: Optional[int] = 32
     tools: Dict[str, Tool] = field(init=False)
+    _system_prompt: str = field(init=False, repr=False)
+    # The API runs turns of one shared agent in concurrent threads
+    _history_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
-        self.tools = self._load_tools(self.tools_config)
+        self.tools = self._load_tools(self.tools_config) if self.tools_config is not None else {}
+        # Tools are fixed after loading, so the tool-calling prompt only needs building once.
+        self._system_prompt = self._build_system_prompt()
 
     def _load_tools(self, config_path: str) -> Dict[str, Tool]:
         if not os.path.isabs(config_path):
             config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, config_path))
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = yaml.safe_load(f) or {}
+        config = _read_config(config_path)
         tools: Dict[str, Tool] = {}
         for entry in config.get("tools", []):
             name = entry["name"]
             module_name = entry["module"]
             class_name = entry.get("class") or f"{name.capitalize()}Tool"
-            module = importlib.import_module(module_name)
-            cls = getattr(module, class_name)
-            tools[name] = cls()
+            tools[name] = _shared_tool(_resolve_tool_cls(module_name, class_name))
             logger.info("Loaded tool: %s from %s:%s", name, module_name, class_name)
         return tools
 
@@ -47,37 +133,60 @@ class Agent:
             "Available tools:",
         ]
         for tool in self.tools.values():
-            lines.append(f"- {tool.name}: {tool.description}. Input schema: {tool.input_schema}")
+            lines.append(f"- {tool.name}: {tool.description}. Input schema: {_dumps(tool.input_schema)}")
         lines.append('When you decide to use a tool, respond with JSON exactly as:')
         lines.append('{"tool": {"name": "<tool_name>", "args": {"param1": "value"}}}')
         lines.append("No code fences. No extra text.")
         return "\n".join(lines)
 
     def _try_extract_tool_call(self, text: str) -> Optional[Dict[str, Any]]:
-        text = text.strip()
-        # Fast path: whole message is JSON
-        try:
-            obj = json.loads(text)
-            if isinstance(obj, dict) and "tool" in obj:
-                return obj
-        except Exception:
-            pass
-        # Tolerant path: try first {...} block
+        # Scan for balanced top-level {...} objects so only the candidate span is parsed,
+        # even when the model wraps the call in prose that itself contains braces.
         start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end > start:
+        while start != -1:
+            end = _match_brace(text, start)
+            if end == -1:
+                return None
             try:
-                obj = json.loads(text[start : end + 1])
-                if isinstance(obj, dict) and "tool" in obj:
-                    return obj
-            except Exception:
-                pass
+                obj = _loads(text[start : end + 1])
+            except ValueError:
+                obj = None
+            if isinstance(obj, dict) and "tool" in obj:
+                return obj
+            start = text.find("{", end + 1)
         return None
 
+    def _generate(self, message: str, system_prompt: Optional[str], use_tools: bool) -> str:
+        stream = getattr(self.backend, "generate_stream", None)
+        if not use_tools or stream is None:
+            return self.backend.generate(prompt=message, history=self.history, system_prompt=system_prompt)
+        # Stream so a tool call can be acted on as soon as its JSON object closes;
+        # leaving the loop closes the stream and aborts the rest of the generation.
+        parts: List[str] = []
+        with closing(stream(prompt=message, history=self.history, system_prompt=system_prompt)) as chunks:
+            for delta in chunks:
+                parts.append(delta)
+                if "}" in delta:
+                    text = "".join(parts)
+                    if text.lstrip().startswith("{") and self._try_extract_tool_call(text) is not None:
+                        break
+        return "".join(parts)
+
+    def _remember(self, *messages: Dict[str, str]) -> None:
+        with self._history_lock:
+            self.history.extend(messages)
+            if self.max_history is not None and len(self.history) > self.max_history:
+                # Trim whole turns: chat turns add two messages and tool turns three, so a
+                # bare cut could leave an assistant message whose user message was dropped.
+                cut = len(self.history) - self.max_history
+                while cut < len(self.history) and self.history[cut]["role"] != "user":
+                    cut += 1
+                del self.history[:cut]
+
     def chat(self, message: str, *, use_tools: bool = False) -> str:
         logger.info("User: %s", message)
-        system_prompt = self._build_system_prompt() if use_tools else None
-        response = self.backend.generate(prompt=message, history=self.history, system_prompt=system_prompt)
+        system_prompt = self._system_prompt if use_tools else None
+        response = self._generate(message, system_prompt, use_tools)
         reply = response.strip()
 
         if use_tools:
@@ -89,18 +198,39 @@ class Agent:
                     args: Dict[str, Any] = req.get("args") or {}
                     tool = self.tools.get(name)
                     if not tool:
-                        return json.dumps({"error": f"Unknown tool: {name}"}, ensure_ascii=False)
-                    result = tool.run(**args)
+                        return _dumps({"error": f"Unknown tool: {name}"})
+                    result = _dumps(tool.run(**args))
                     # log into history
-                    self.history.append({"role": "user", "content": message})
-                    self.history.append({"role": "assistant", "content": reply})
-                    self.history.append({"role": "assistant", "content": json.dumps(result, ensure_ascii=False)})
-                    return json.dumps(result, ensure_ascii=False)
+                    self._remember(
+                        {"role": "user", "content": message},
+                        {"role": "assistant", "content": reply},
+                        {"role": "assistant", "content": result},
+                    )
+                    return result
                 except Exception as e:
                     logger.exception("Tool call failed: %s", e)
-                    return json.dumps({"error": str(e)}, ensure_ascii=False)
+                    return _dumps({"error": str(e)})
 
         # normal chat
-        self.history.append({"role": "user", "content": message})
-        self.history.append({"role": "assistant", "content": reply})
+        self._remember({"role": "user", "content": message}, {"role": "assistant", "content": reply})
         return reply
+
+    def stream_chat(self, message: str, *, use_tools: bool = False) -> Iterator[str]:
+        """Yield the reply as it is generated.
+
+        Tool turns need the complete reply before anything can be shown, so they (and
+        backends without ``generate_stream``) yield the final answer as a single chunk.
+        """
+        stream = getattr(self.backend, "generate_stream", None)
+        if use_tools or stream is None:
+            yield self.chat(message, use_tools=use_tools)
+            return
+        logger.info("User: %s", message)
+        parts: List[str] = []
+        with closing(stream(prompt=message, history=self.history, system_prompt=None)) as chunks:
+            for delta in chunks:
+                parts.append(delta)
+                yield delta
+        # Only a reply that was generated completely becomes part of the history
+        reply = "".join(parts).strip()
+        self._remember({"role": "user", "content": message}, {"role": "assistant", "content": reply})
@@ -1,13 +1,50 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Protocol
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple, Union
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+
+try:  # optional: typed decoding that skips every reply field we never read
+    import msgspec
+except ImportError:  # pragma: no cover - orjson fallback below
+    msgspec = None
 
 logger = logging.getLogger(__name__)
 
+if msgspec is not None:
+
+    class _ReplyMessage(msgspec.Struct):
+        content: Optional[str] = None
+
+    class _Reply(msgspec.Struct):
+        message: Optional[_ReplyMessage] = None
+        done: bool = False
+        error: Optional[str] = None
+
+    _reply_decoder = msgspec.json.Decoder(_Reply)
+
+def _parse_reply(raw: bytes) -> Tuple[Optional[str], bool, Optional[str]]:
+    """Return ``(content, done, error)`` from an Ollama chat reply or stream chunk."""
+    if msgspec is not None:
+        reply = _reply_decoder.decode(raw)
+        content = reply.message.content if reply.message is not None else None
+        return content, reply.done, reply.error
+    obj = orjson.loads(raw)
+    return (obj.get("message") or {}).get("content"), bool(obj.get("done")), obj.get("error")
+
+def create_session(pool_maxsize: int = 16) -> requests.Session:
+    """Return a pooled keep-alive session so turns reuse their TCP connections to Ollama."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive", "Content-Type": "application/json"})
+    return session
+
 class LLMBackend(Protocol):
     def generate(
         self,
@@ -23,13 +60,75 @@ class OllamaBackend:
     model: str
     base_url: str = "http://localhost:11434"
     timeout: int = 120
+    # How long Ollama keeps the model loaded after a request ("5m", seconds, -1 = forever)
+    keep_alive: Optional[Union[int, str]] = None
+    # Shared pooled session, e.g. one per server process; created and owned here when omitted.
+    session: Optional[requests.Session] = field(default=None, repr=False)
+    _session: requests.Session = field(init=False, repr=False)
+    _owns_session: bool = field(default=False, init=False, repr=False)
+    _system_cache: Tuple[Optional[str], bytes] = field(default=(None, b""), init=False, repr=False)
+    _message_cache: Dict[Tuple[str, str], bytes] = field(default_factory=dict, init=False, repr=False)
 
-    def _chat(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> Dict[str, Any]:
-        payload = {"model": model or self.model, "messages": messages, "stream": False}
+    def __post_init__(self) -> None:
+        self._owns_session = self.session is None
+        self._session = self.session if self.session is not None else create_session()
+
+    def close(self) -> None:
+        if self._owns_session:
+            self._session.close()
+
+    def _request_options(self, body: Dict[str, object]) -> Dict[str, object]:
+        if self.keep_alive is not None:
+            body["keep_alive"] = self.keep_alive
+        return body
+
+    def warmup(self) -> None:
+        """Ask Ollama to load the model now, so the first real turn does not wait for it."""
+        payload = orjson.dumps(self._request_options({"model": self.model}))
+        resp = self._session.post(f"{self.base_url}/api/generate", data=payload, timeout=self.timeout)
+        resp.raise_for_status()
+
+    def _chat(self, payload: bytes) -> bytes:
         logger.debug("POST %s/api/chat payload=%s", self.base_url, payload)
-        resp = requests.post(f"{self.base_url}/api/chat", json=payload, timeout=self.timeout)
+        resp = self._session.post(f"{self.base_url}/api/chat", data=payload, timeout=self.timeout, stream=False)
         resp.raise_for_status()
-        return resp.json()
+        return resp.content
+
+    def _encode_system(self, system_prompt: str) -> bytes:
+        # The agent passes the same prompt object every turn, so it is encoded once.
+        cached, encoded = self._system_cache
+        if cached is not system_prompt and cached != system_prompt:
+            encoded = orjson.dumps({"role": "system", "content": system_prompt})
+            self._system_cache = (system_prompt, encoded)
+        return encoded
+
+    def _encode_payload(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        model: Optional[str],
+        stream: bool,
+    ) -> bytes:
+        messages: List[bytes] = []
+        if system_prompt:
+            messages.append(self._encode_system(system_prompt))
+        # History messages are resent every turn: reuse their encoding from the previous call.
+        # The cache is rebuilt from the current history, so it never outgrows it.
+        previous = self._message_cache
+        cache: Dict[Tuple[str, str], bytes] = {}
+        for msg in history:
+            if msg.keys() != {"role", "content"}:
+                messages.append(orjson.dumps(msg))
+                continue
+            key = (msg["role"], msg["content"])
+            encoded = previous.get(key) or orjson.dumps(msg)
+            cache[key] = encoded
+            messages.append(encoded)
+        self._message_cache = cache
+        messages.append(orjson.dumps({"role": "user", "content": prompt}))
+        head = orjson.dumps(self._request_options({"model": model or self.model, "stream": stream}))
+        return b"".join((head[:-1], b',"messages":[', b",".join(messages), b"]}"))
 
     def generate(
         self,
@@ -38,13 +137,35 @@ class OllamaBackend:
         system_prompt: Optional[str] = None,
         model: Optional[str] = None,
     ) -> str:
-        messages: List[Dict[str, str]] = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.extend(history)
-        messages.append({"role": "user", "content": prompt})
-        result = self._chat(messages, model=model)
-        content = result.get("message", {}).get("content")
+        raw = self._chat(self._encode_payload(prompt, history, system_prompt, model, stream=False))
+        content, _, error = _parse_reply(raw)
         if content is None:
-            raise ValueError(f"No content in Ollama response: {result}")
+            raise ValueError(f"No content in Ollama response: {error or raw.decode('utf-8', 'replace')}")
         return content
+
+    def generate_stream(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> Iterator[str]:
+        """Yield content deltas as Ollama streams them.
+
+        Closing the generator early closes the HTTP response, which makes Ollama
+        stop generating.
+        """
+        payload = self._encode_payload(prompt, history, system_prompt, model, stream=True)
+        logger.debug("POST %s/api/chat (stream) payload=%s", self.base_url, payload)
+        with self._session.post(f"{self.base_url}/api/chat", data=payload, timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                delta, done, error = _parse_reply(line)
+                if error is not None:
+                    raise ValueError(f"Ollama error: {error}")
+                if delta:
+                    yield delta
+                if done:
+                    break
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+class _End:
+    __slots__ = ("error",)
+
+    def __init__(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+
+async def iterate_in_thread(chunks: Iterator[T]) -> AsyncIterator[T]:
+    """Yield the items of a blocking iterator (e.g. ``Agent.stream_chat``) to async code.
+
+    One daemon thread drives the iterator. When the consumer stops early (a client
+    disconnects, Ctrl+C), that thread closes the generator right after the item in
+    progress, so the model stream is aborted; closing it from any other thread would fail
+    with "generator already executing". Being a daemon thread it never delays exit.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[Any] = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:  # the event loop is already closed
+            pass
+
+    def drive() -> None:
+        end = _End()
+        try:
+            for item in chunks:
+                if cancelled.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            end = _End(e)
+        finally:
+            try:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+            finally:
+                put(end)
+
+    threading.Thread(target=drive, name="iterate-in-thread", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, _End):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+    finally:
+        cancelled.set()
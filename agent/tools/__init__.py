@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import functools
 from typing import Any, Dict, Protocol
 
+import orjson
+
 class Tool(Protocol):
     """Protocol for agent tools."""
     name: str
@@ -11,3 +14,14 @@ class Tool(Protocol):
     def run(self, **kwargs: Any) -> Any:
         """Execute the tool and return a JSON-serialisable result."""
         ...
+
+class BaseTool:
+    """Optional base class for tools, providing a cached JSON descriptor."""
+    name: str
+    description: str
+    input_schema: Dict[str, Any]
+
+    @functools.cached_property
+    def json_descriptor(self) -> bytes:
+        """The tool's entry in the ``/tools`` listing, encoded once per instance."""
+        return orjson.dumps({"name": self.name, "description": self.description, "input_schema": self.input_schema})
@@ -2,9 +2,9 @@ from __future__ import annotations
 
 import os
 from typing import Any, Dict
-from . import Tool
+from . import BaseTool
 
-class FileReaderTool:
+class FileReaderTool(BaseTool):
     """Read a text file from the repository with safe path checks."""
 
     name = "file_reader"
@@ -18,6 +18,8 @@ class FileReaderTool:
         self.repo_root = os.path.abspath(
             repo_root or os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
         )
+        # Compare against "<root>/" so a sibling such as "<root>-evil" does not pass the check.
+        self._root_prefix = os.path.join(self.repo_root, "")
 
     def run(self, **kwargs: Any) -> Dict[str, Any]:
         path = kwargs.get("path")
@@ -26,11 +28,24 @@ class FileReaderTool:
             raise ValueError("'path' argument is required")
 
         abs_path = os.path.abspath(os.path.join(self.repo_root, path))
-        if not abs_path.startswith(self.repo_root):
+        if not abs_path.startswith(self._root_prefix):
             raise ValueError("Access outside the repository is not allowed")
         if not os.path.isfile(abs_path):
             raise FileNotFoundError(f"File not found: {path}")
 
-        with open(abs_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read(max_chars)
+        # One bounded read on a raw descriptor, decoded once: max_chars characters take at
+        # most 4 bytes each in UTF-8. A negative max_chars reads the whole file, as
+        # f.read(-1) did.
+        fd = os.open(abs_path, os.O_RDONLY)
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            data = os.read(fd, max_chars * 4 if max_chars >= 0 else os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        # Universal newlines, as text-mode open() gave: CRLF and CR become LF
+        content = data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+        if max_chars < 0:
+            return {"content": content, "truncated": False}
+        content = content[:max_chars]
         return {"content": content, "truncated": len(content) >= max_chars}
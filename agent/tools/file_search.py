@@ -1,11 +1,24 @@
 from __future__ import annotations
 
+import logging
+import mmap
 import os
 import re
-from typing import Any, Dict, List
-from . import Tool
+import shutil
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-class FileSearchTool:
+import orjson
+
+from . import BaseTool
+
+logger = logging.getLogger(__name__)
+
+class FileSearchTool(BaseTool):
     """Search for a string or regex pattern across repository files."""
 
     name = "file_search"
@@ -16,16 +29,19 @@ class FileSearchTool:
         "max_results": {"type": "integer", "default": 100},
     }
 
-    _IGNORE_DIRS = {".git", "__pycache__", "venv", "node_modules", ".mypy_cache"}
-    _TEXT_EXT = {".py", ".md", ".txt", ".json", ".yaml", ".yml", ".toml", ".sh", ".ps1", ".html", ".css", ".js"}
+    _IGNORE_DIRS = frozenset({".git", "__pycache__", "venv", "node_modules", ".mypy_cache"})
+    _MAX_FILE_SIZE = 4 * 1024 * 1024
+    _MAX_WORKERS = min(8, os.cpu_count() or 1)
+    _TEXT_EXT = frozenset(
+        {".py", ".md", ".txt", ".json", ".yaml", ".yml", ".toml", ".sh", ".ps1", ".html", ".css", ".js"}
+    )
 
     def __init__(self, repo_root: str | None = None) -> None:
         self.repo_root = os.path.abspath(
             repo_root or os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
         )
-
-    def _is_text_file(self, path: str) -> bool:
-        return os.path.splitext(path)[1].lower() in self._TEXT_EXT
+        # Prefer ripgrep when installed: it walks and matches in native code.
+        self._rg = shutil.which("rg")
 
     def run(self, **kwargs: Any) -> Dict[str, Any]:
         query = kwargs.get("query")
@@ -34,24 +50,166 @@ class FileSearchTool:
         if not query:
             raise ValueError("'query' argument is required")
 
-        pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE)
+        if self._rg:
+            result = self._search_rg(query, regex, max_results)
+            if result is not None:
+                return result
+        return self._search_python(query, regex, max_results)
+
+    def _search_rg(self, query: str, regex: bool, max_results: int) -> Optional[Dict[str, Any]]:
+        """Search with ripgrep; None when rg rejects the query (e.g. lookaround, backrefs)."""
+        # --sort path (single-threaded in rg) keeps results, and so truncation at
+        # max_results, deterministic and in the same order as the Python walk.
+        cmd = [
+            self._rg, "--json", "--line-number", "--ignore-case", "--hidden", "--no-ignore", "--no-messages",
+            "--sort", "path", "--max-filesize", str(self._MAX_FILE_SIZE),
+        ]
+        if not regex:
+            cmd.append("--fixed-strings")
+        for d in self._IGNORE_DIRS:
+            cmd += ["--glob", f"!{d}"]
+        for ext in self._TEXT_EXT:
+            cmd += ["--iglob", f"*{ext}"]
+        cmd += ["--regexp", query, "."]
+
         matches: List[Dict[str, Any]] = []
+        with subprocess.Popen(cmd, cwd=self.repo_root, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+            assert proc.stdout is not None and proc.stderr is not None
+            try:
+                for raw in proc.stdout:
+                    event = orjson.loads(raw)
+                    if event.get("type") != "match":
+                        continue
+                    data = event["data"]
+                    path = data["path"].get("text")
+                    text = data["lines"].get("text")
+                    if path is None or text is None:  # non-UTF-8 path or line
+                        continue
+                    rel = os.path.normpath(path)
+                    matches.append({"file": rel, "line": data["line_number"], "text": text.rstrip("\n")})
+                    if len(matches) >= max_results:
+                        return {"matches": matches, "truncated": True}
+                # --no-messages silences per-file errors, so anything left on stderr is fatal
+                err = proc.stderr.read().decode("utf-8", errors="replace").strip()
+                proc.wait()
+            finally:
+                if proc.returncode is None:
+                    proc.kill()
+        # rg exits 0 on matches, 1 on none and 2 on errors such as a rejected pattern.
+        # Its regex dialect differs from Python's, so leave such queries to the fallback.
+        if proc.returncode == 2 and err:
+            logger.debug("rg rejected %r, using the Python scanner: %s", query, err)
+            return None
+        return {"matches": matches, "truncated": False}
+
+    def _scan_file(self, full: str, rel: str, pattern: re.Pattern[Any], limit: int) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` matching lines of one file, one entry per line."""
+        with open(full, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if b"\0" in mm[:512]:  # binary file despite its extension
+                    return []
+                if isinstance(pattern.pattern, str):
+                    # Case folding beyond ASCII needs a str pattern, hence decoded text
+                    return self._scan_lines(mm[:].decode("utf-8", errors="ignore"), "\n", rel, pattern, limit)
+                # Match on the raw bytes; only the matching lines are ever decoded.
+                return self._scan_lines(mm, b"\n", rel, pattern, limit)
 
-        for root, dirs, files in os.walk(self.repo_root):
-            # prune ignored directories
-            dirs[:] = [d for d in dirs if d not in self._IGNORE_DIRS]
-            for fn in files:
-                full = os.path.join(root, fn)
-                if not self._is_text_file(full):
+    @staticmethod
+    def _scan_lines(buf: Any, nl: Any, rel: str, pattern: re.Pattern[Any], limit: int) -> List[Dict[str, Any]]:
+        found: List[Dict[str, Any]] = []
+        size = len(buf)
+        pos = 0
+        # Matches arrive in file order, so line numbers are tracked incrementally:
+        # each byte is newline-counted at most once per file.
+        lineno, counted = 1, 0
+        while len(found) < limit:
+            m = pattern.search(buf, pos)
+            if m is None:
+                break
+            end = buf.find(nl, m.start())
+            if end == -1:
+                end = size
+            if m.end() > end:
+                # The match ran into the next line (\s, [^...] match newlines); matching
+                # is line-based, so retry within the line the match started on.
+                m = pattern.search(buf, m.start(), end)
+                if m is None:
+                    pos = end + 1
                     continue
-                rel = os.path.relpath(full, self.repo_root)
-                try:
-                    with open(full, "r", encoding="utf-8", errors="ignore") as f:
-                        for lineno, line in enumerate(f, 1):
-                            if pattern.search(line):
-                                matches.append({"file": rel, "line": lineno, "text": line.rstrip("\n")})
-                                if len(matches) >= max_results:
-                                    return {"matches": matches, "truncated": True}
-                except Exception:
+            start = buf.rfind(nl, 0, m.start()) + 1
+            lineno += buf[counted:start].count(nl)
+            counted = start
+            text = buf[start:end]
+            if isinstance(text, bytes):
+                text = text.decode("utf-8", errors="ignore")
+            found.append({"file": rel, "line": lineno, "text": text.rstrip("\r")})
+            pos = end + 1
+        return found
+
+    def _iter_candidates(self) -> Iterator[Tuple[str, str]]:
+        """Yield ``(full_path, rel_path)`` for every file worth scanning, in path order."""
+        return self._walk(self.repo_root, "")
+
+    def _walk(self, path: str, rel_dir: str) -> Iterator[Tuple[str, str]]:
+        # Entries are visited sorted by name, descending into directories in place; this is
+        # the order of `rg --sort path`, so both search paths truncate at the same match.
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return
+        ignore_dirs, text_ext = self._IGNORE_DIRS, self._TEXT_EXT
+        for entry in entries:
+            name = entry.name
+            rel = os.path.join(rel_dir, name) if rel_dir else name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in ignore_dirs:
+                        yield from self._walk(entry.path, rel)
                     continue
+                # Check the extension on the bare name before any stat
+                dot = name.rfind(".")
+                if dot < 0 or name[dot:].lower() not in text_ext:
+                    continue
+                size = entry.stat().st_size
+            except OSError:
+                continue
+            # empty files cannot be mapped; huge ones are generated data or logs
+            if size and size <= self._MAX_FILE_SIZE:
+                yield entry.path, rel
+
+    def _search_python(self, query: str, regex: bool, max_results: int) -> Dict[str, Any]:
+        if not regex and query.isascii():
+            # Plain ASCII text matches the same on raw bytes, so skip decoding whole files
+            pattern: re.Pattern[Any] = re.compile(re.escape(query.encode("utf-8")), re.IGNORECASE)
+        else:
+            # On bytes, IGNORECASE folds only ASCII ("запуск" misses "Запуск") and ., \w,
+            # \b, [^...] see single bytes of UTF-8 text, so these match on decoded text.
+            pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE | re.MULTILINE)
+        matches: List[Dict[str, Any]] = []
+        stop = threading.Event()
+
+        def scan(candidate: Tuple[str, str]) -> List[Dict[str, Any]]:
+            if stop.is_set():
+                return []
+            try:
+                return self._scan_file(candidate[0], candidate[1], pattern, max_results)
+            except Exception:
+                return []
+
+        # Opening and mapping files happens in syscalls that release the GIL, so a few
+        # files are in flight at once. Candidates are fed lazily through a bounded window:
+        # the walk stops as soon as max_results is reached, and results keep walk order.
+        candidates = self._iter_candidates()
+        with ThreadPoolExecutor(max_workers=self._MAX_WORKERS) as ex:
+            pending = deque(ex.submit(scan, c) for c in islice(candidates, 2 * self._MAX_WORKERS))
+            while pending:
+                matches.extend(pending.popleft().result())
+                if len(matches) >= max_results:
+                    stop.set()
+                    ex.shutdown(wait=False, cancel_futures=True)
+                    return {"matches": matches[:max_results], "truncated": True}
+                candidate = next(candidates, None)
+                if candidate is not None:
+                    pending.append(ex.submit(scan, candidate))
         return {"matches": matches, "truncated": False}
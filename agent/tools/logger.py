@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-import datetime
+import atexit
 import os
-from typing import Any, Dict
-from . import Tool
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from . import BaseTool
 
-class LoggerTool:
+class LoggerTool(BaseTool):
     """Append a note to notes.txt in the repository root."""
 
     name = "logger"
@@ -19,12 +21,41 @@ class LoggerTool:
             repo_root or os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
         )
         self.notes_path = os.path.join(self.repo_root, "notes.txt")
+        self._fd: Optional[int] = None
+        self._file_id: Optional[Tuple[int, int]] = None  # (st_dev, st_ino) of the open file
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _append(self, data: bytes) -> None:
+        # The descriptor is opened on first use (not at tool load) and reused, unless
+        # notes.txt was deleted or rotated meanwhile; writing on would go to the old inode.
+        with self._lock:
+            if self._fd is not None:
+                try:
+                    st = os.stat(self.notes_path)
+                    current = (st.st_dev, st.st_ino)
+                except FileNotFoundError:
+                    current = None
+                if current != self._file_id:
+                    os.close(self._fd)
+                    self._fd = None
+            if self._fd is None:
+                self._fd = os.open(self.notes_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                st = os.fstat(self._fd)
+                self._file_id = (st.st_dev, st.st_ino)
+            os.write(self._fd, data)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
 
     def run(self, **kwargs: Any) -> Dict[str, Any]:
         note = kwargs.get("note")
         if not note:
             raise ValueError("'note' argument is required")
-        timestamp = datetime.datetime.now().isoformat(timespec="seconds")
-        with open(self.notes_path, "a", encoding="utf-8") as f:
-            f.write(f"[{timestamp}] {note}\n")
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        # A single O_APPEND write per note, so concurrent notes never interleave.
+        self._append(f"[{timestamp}] {note}\n".encode("utf-8"))
         return {"path": os.path.relpath(self.notes_path, self.repo_root), "note": note}
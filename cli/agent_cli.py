@@ -1,20 +1,57 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import functools
 import logging
+import os
 import sys
+from typing import TYPE_CHECKING, AsyncIterator, Callable
 
-from agent import Agent, OllamaBackend
+from cli.daemon import SOCKET_PATH, DaemonClient, serve, stream_local
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Local Qwen Agent CLI")
-    parser.add_argument("--use-tools", action="store_true", help="Enable tool invocations")
-    parser.add_argument("--model", type=str, default="qwen2.5-coder:14b", help="Model name")
-    args = parser.parse_args()
+if TYPE_CHECKING:
+    from agent import Agent
 
-    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
-    backend = OllamaBackend(model=args.model)
-    agent = Agent(backend=backend, tools_config="agent/config/tools.yaml")
+HISTORY_FILE = os.path.expanduser("~/.local_agent_history")
+DEFAULT_MODEL = "qwen2.5-coder:14b"
+
+def _build_agent(args: argparse.Namespace, use_tools: bool) -> Agent:
+    # Imported here so --help, argument errors and daemon clients never load the agent
+    # package (YAML parser, tool modules, HTTP client).
+    from agent import Agent, OllamaBackend
+
+    backend = OllamaBackend(model=args.model or DEFAULT_MODEL)
+    return Agent(backend=backend, tools_config="agent/config/tools.yaml" if use_tools else None)
+
+async def _print_reply(chunks: AsyncIterator[str]) -> None:
+    # Tokens are printed as the model produces them
+    print("Agent: ", end="", flush=True)
+    async for delta in chunks:
+        print(delta, end="", flush=True)
+    print()
+
+async def amain(args: argparse.Namespace) -> None:
+    if args.daemon:
+        print(f"Serving the agent on {args.socket}. Ctrl+C to stop.")
+        # Clients choose per turn whether tools are used, so the daemon always loads them
+        await serve(_build_agent(args, use_tools=True), args.socket)
+        return
+
+    # Reuse a running daemon's warm agent when there is one. The daemon serves the model
+    # it was started with, so an explicit --model always gets an in-process agent.
+    client = await DaemonClient.connect(args.socket) if args.model is None else None
+    reply: Callable[[str], AsyncIterator[str]]
+    if client is not None:
+        print(f"Connected to the agent daemon on {args.socket}.")
+        reply = functools.partial(client.chat, use_tools=args.use_tools)
+    else:
+        agent = _build_agent(args, use_tools=args.use_tools)
+        reply = functools.partial(stream_local, agent, use_tools=args.use_tools)
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.history import FileHistory
+
+    session: PromptSession[str] = PromptSession(history=FileHistory(HISTORY_FILE))
 
     print("Local Qwen Agent CLI. Ctrl+C/Ctrl+D to exit.")
     if args.use_tools:
@@ -23,13 +60,36 @@ def main() -> None:
     try:
         while True:
             try:
-                user_input = input("You: ")
+                user_input = await session.prompt_async("You: ")
             except EOFError:
                 break
             if not user_input.strip():
                 continue
-            reply = agent.chat(user_input, use_tools=args.use_tools)
-            print(f"Agent: {reply}")
+            try:
+                await _print_reply(reply(user_input))
+            except ConnectionError as e:  # the daemon went away
+                print(f"\nError: {e}")
+                break
+            except Exception as e:
+                # A failed turn (model error, oversized message) must not end the session
+                print(f"\nError: {e}")
+    finally:
+        if client is not None:
+            await client.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Qwen Agent CLI")
+    parser.add_argument("--use-tools", action="store_true", help="Enable tool invocations")
+    parser.add_argument(
+        "--model", type=str, default=None, help=f"Model name (default: {DEFAULT_MODEL}, or the daemon's model)"
+    )
+    parser.add_argument("--daemon", action="store_true", help="Keep one agent running and serve it on --socket")
+    parser.add_argument("--socket", type=str, default=SOCKET_PATH, help="UNIX socket of the agent daemon")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    try:
+        asyncio.run(amain(args))
     except KeyboardInterrupt:
         print("\nExiting.")
         sys.exit(0)
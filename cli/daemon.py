@@ -0,0 +1,163 @@
+"""
+Persistent agent daemon for the CLI.
+
+``python -m cli.agent_cli --daemon`` keeps one ``Agent`` (tools config, tool modules,
+HTTP session and conversation history) alive behind a UNIX domain socket. Later CLI
+runs connect to it instead of paying the start-up cost again.
+
+Wire protocol: the client writes one JSON object per line,
+``{"message": str, "use_tools": bool}``; the daemon answers with JSON lines
+``{"delta": str}`` and a final ``{"done": true}`` or ``{"error": str}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from contextlib import aclosing
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+import orjson
+
+if TYPE_CHECKING:  # the CLI imports this module before it knows whether it needs an agent
+    from agent import Agent
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = os.path.expanduser("~/.local_agent/sock")
+# asyncio's default 64 KiB line limit is easily exceeded: a tool turn arrives as one delta
+# holding the whole file_reader/file_search result. Deltas are also split so that an
+# encoded line (at worst 6 bytes per char for escaped control characters) stays far
+# below the limit on the client side.
+LINE_LIMIT = 8 * 1024 * 1024
+_MAX_DELTA_CHARS = 256 * 1024
+
+def stream_local(agent: Agent, message: str, use_tools: bool) -> AsyncIterator[str]:
+    """Yield reply deltas from an in-process agent without blocking the event loop.
+
+    Stopping early (Ctrl+C, a daemon client going away) closes the model stream, and
+    never waits for the delta in progress.
+    """
+    from agent.streaming import iterate_in_thread
+
+    return iterate_in_thread(agent.stream_chat(message, use_tools=use_tools))
+
+async def _is_listening(path: str) -> bool:
+    try:
+        _, writer = await asyncio.open_unix_connection(path)
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+async def _discard_line(reader: asyncio.StreamReader) -> None:
+    """Drop the rest of a line that overran ``LINE_LIMIT``."""
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+
+async def serve(agent: Agent, path: str = SOCKET_PATH) -> None:
+    """Serve ``agent`` on a UNIX socket until cancelled."""
+    if await _is_listening(path):
+        raise RuntimeError(f"An agent daemon is already listening on {path}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket left by a daemon that did not shut down cleanly
+    # One conversation: turns from all clients go through the agent one at a time
+    turn_lock = asyncio.Lock()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:  # EOF, maybe after an unterminated line
+                    if not e.partial:
+                        break
+                    line = e.partial
+                except asyncio.LimitOverrunError:
+                    await _discard_line(reader)
+                    error = f"Request exceeds the daemon's {LINE_LIMIT} byte line limit"
+                    writer.write(orjson.dumps({"error": error}) + b"\n")
+                    await writer.drain()
+                    continue
+                try:
+                    request = orjson.loads(line)
+                    message = request["message"]
+                    if not isinstance(message, str):
+                        raise TypeError("'message' must be a string")
+                except (ValueError, KeyError, TypeError) as e:
+                    error = f"Bad request, expected {{\"message\": str, \"use_tools\": bool}}: {e!r}"
+                    writer.write(orjson.dumps({"error": error}) + b"\n")
+                    await writer.drain()
+                    continue
+                async with turn_lock:
+                    try:
+                        deltas = stream_local(agent, message, bool(request.get("use_tools")))
+                        # aclosing: a write failing mid-turn must stop the model stream too
+                        async with aclosing(deltas):
+                            async for delta in deltas:
+                                for start in range(0, len(delta), _MAX_DELTA_CHARS):
+                                    part = delta[start : start + _MAX_DELTA_CHARS]
+                                    writer.write(orjson.dumps({"delta": part}) + b"\n")
+                                await writer.drain()
+                        writer.write(b'{"done":true}\n')
+                    except Exception as e:
+                        logger.exception("Daemon turn failed: %s", e)
+                        writer.write(orjson.dumps({"error": str(e)}) + b"\n")
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.info("Client connection closed: %s", e)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(handle, path=path, limit=LINE_LIMIT)
+    os.chmod(path, 0o600)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+class DaemonClient:
+    """Thin client that forwards chat turns to a running daemon."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, path: str = SOCKET_PATH) -> Optional["DaemonClient"]:
+        """Return a client, or None when no daemon is listening on ``path``."""
+        try:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        except OSError:
+            return None
+        return cls(reader, writer)
+
+    async def chat(self, message: str, use_tools: bool) -> AsyncIterator[str]:
+        request = orjson.dumps({"message": message, "use_tools": use_tools}) + b"\n"
+        if len(request) > LINE_LIMIT:
+            raise ValueError(f"Message exceeds the daemon's {LINE_LIMIT} byte line limit")
+        self._writer.write(request)
+        await self._writer.drain()
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                raise ConnectionError("Agent daemon closed the connection")
+            event = orjson.loads(line)
+            if "delta" in event:
+                yield event["delta"]
+            elif "error" in event:
+                raise RuntimeError(event["error"])
+            else:
+                return
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
@@ -0,0 +1,27 @@
+#!/bin/bash
+
+# Production-style launcher for the agent's API server. Unlike run_agent.sh it
+# starts several uvicorn worker processes and uses the uvloop event loop and the
+# httptools HTTP parser (both installed with "uvicorn[standard]"). Each worker
+# builds its own agent and Ollama session at startup.
+#
+# Ollama still runs as a single daemon, so the server divides OLLAMA_NUM_PARALLEL
+# between the workers (see WEB_CONCURRENCY in server/api.py) instead of letting
+# every worker send that many concurrent requests. Each worker needs at least one
+# slot, so by default there are no more workers than OLLAMA_NUM_PARALLEL.
+
+set -e
+
+PORT=${PORT:-8000}
+NUM_PARALLEL=${OLLAMA_NUM_PARALLEL:-4}
+CPUS=$(nproc)
+WORKERS=${WORKERS:-$(( CPUS < NUM_PARALLEL ? CPUS : NUM_PARALLEL ))}
+if [ "$WORKERS" -gt "$NUM_PARALLEL" ]; then
+    echo "Warning: $WORKERS workers exceed OLLAMA_NUM_PARALLEL=$NUM_PARALLEL;" \
+        "up to $WORKERS turns will be sent to Ollama at once." >&2
+fi
+export WEB_CONCURRENCY="$WORKERS"
+
+echo "Starting agent server on port $PORT with $WORKERS workers..."
+python3 -m uvicorn server.api:app --host 0.0.0.0 --port "$PORT" \
+    --workers "$WORKERS" --loop uvloop --http httptools --backlog 2048
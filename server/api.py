@@ -1,60 +1,275 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import os
-from typing import List
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
-from agent import Agent, OllamaBackend
+from agent import Agent, OllamaBackend, create_session
+from agent.streaming import iterate_in_thread
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Local Qwen Agent")
+def _ollama_url(host: str) -> str:
+    # Accept Ollama's own OLLAMA_HOST format ("127.0.0.1", "host:port") as well as full URLs
+    if "://" not in host:
+        hostport, sep, path = host.partition("/")
+        if ":" not in hostport:
+            hostport += ":11434"
+        host = f"http://{hostport}{sep}{path}"
+    return host.rstrip("/")
 
-# Restrictive CORS for local development
+def _keep_alive(value: Optional[str]) -> Optional[Union[int, str]]:
+    # Ollama takes seconds as a number and durations such as "10m" as strings
+    if not value:
+        return None
+    return int(value) if value.lstrip("-").isdigit() else value
+
+def _tools_json(agent: Agent) -> bytes:
+    descriptors = []
+    for tool in agent.tools.values():
+        descriptor = getattr(tool, "json_descriptor", None)  # provided by agent.tools.BaseTool
+        if descriptor is None:
+            info = {"name": tool.name, "description": tool.description, "input_schema": tool.input_schema}
+            descriptor = orjson.dumps(info)
+        descriptors.append(descriptor)
+    return b'{"tools":[' + b",".join(descriptors) + b"]}"
+
+def _tools_cache(agent: Agent) -> Tuple[Agent, bytes, str]:
+    body = _tools_json(agent)
+    return agent, body, f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+
+# Configuration is read once at import; see docs/LOCAL_AGENT.md for the variables.
+MODEL_NAME = os.getenv("MODEL_NAME", "qwen2.5-coder:14b")
+OLLAMA_HOST = _ollama_url(os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434"))
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+OLLAMA_MAX_LOADED_MODELS = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", "1"))
+OLLAMA_KEEP_ALIVE = _keep_alive(os.getenv("OLLAMA_KEEP_ALIVE"))
+# Preload the model at startup so the first request does not pay for loading it
+WARMUP = os.getenv("AGENT_WARMUP", "1") != "0"
+# Every worker process (WEB_CONCURRENCY, see scripts/serve.sh) talks to the same Ollama
+# daemon, so its parallel slots are split between them.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+CHAT_CONCURRENCY = max(1, OLLAMA_NUM_PARALLEL // max(1, WEB_CONCURRENCY))
+# /readyz asks Ollama at most this often (seconds); probes in between get the cached answer
+READY_CACHE_TTL = 5.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One keep-alive pool per worker process, shared by every request to Ollama
+    app.state.http = create_session(pool_maxsize=max(16, CHAT_CONCURRENCY))
+    backend = OllamaBackend(
+        model=MODEL_NAME, base_url=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE, session=app.state.http
+    )
+    app.state.agent = Agent(backend=backend, tools_config="agent/config/tools.yaml")
+    # agent.chat blocks on the model, so it runs in a worker thread; the semaphore keeps
+    # in-flight turns at what Ollama can serve in parallel instead of queueing threads on it.
+    app.state.chat_sem = asyncio.Semaphore(CHAT_CONCURRENCY)
+    if WEB_CONCURRENCY > OLLAMA_NUM_PARALLEL:
+        # Every worker keeps one slot, so together they overcommit Ollama
+        logger.warning(
+            "WEB_CONCURRENCY=%d exceeds OLLAMA_NUM_PARALLEL=%d: up to %d turns may reach Ollama at once",
+            WEB_CONCURRENCY, OLLAMA_NUM_PARALLEL, WEB_CONCURRENCY,
+        )
+    app.state.inflight = {}  # (message, use_tools) -> running chat task
+    # The tool registry is fixed once the agent exists: serialize /tools once
+    app.state.tools_cache = _tools_cache(app.state.agent)
+    app.state.ready = (float("-inf"), False)  # (checked at, Ollama reachable) for /readyz
+    warmup = getattr(backend, "warmup", None)
+    if WARMUP and warmup is not None:
+        try:
+            await asyncio.to_thread(warmup)
+        except Exception as e:
+            logger.warning("Model warmup failed, continuing without it: %s", e)
+    try:
+        yield
+    finally:
+        app.state.http.close()
+
+app = FastAPI(title="Local Qwen Agent", lifespan=lifespan)
+
+# Restrictive CORS for local development. Explicit method/header lists (the API only
+# needs GET/POST with a JSON body) keep preflight handling to small set lookups.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost", "http://127.0.0.1"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type"],
 )
+# Long replies compress well. The size threshold keeps short responses uncompressed and
+# a moderate level keeps CPU cost low; SSE streams are never compressed, so deltas still
+# reach the client as soon as they are produced.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
-MODEL_NAME = os.getenv("MODEL_NAME", "qwen2.5-coder:14b")
-backend = OllamaBackend(model=MODEL_NAME)
-agent = Agent(backend=backend, tools_config="agent/config/tools.yaml")
+async def get_agent(request: Request) -> Agent:
+    # async so FastAPI resolves it inline rather than in the threadpool; tests swap it
+    # out through app.dependency_overrides
+    return request.app.state.agent
+
+# Unknown fields are rejected instead of being parsed and dropped, and instances are
+# immutable once validated. (Pydantic models have no __slots__ option.)
+_MODEL_CONFIG = ConfigDict(extra="forbid", frozen=True)
 
 class ChatRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+
     message: str = Field(..., description="User message")
     use_tools: bool = Field(False, description="Allow tool invocations")
 
 class ChatResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+
     response: str
 
+class ChatBatchRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+
+    items: List[ChatRequest] = Field(..., description="Messages to answer concurrently")
+
+class ChatBatchResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+
+    responses: List[str]
+
+async def _run_chat(app: FastAPI, agent: Agent, req: ChatRequest) -> str:
+    async with app.state.chat_sem:
+        return await asyncio.to_thread(agent.chat, req.message, use_tools=req.use_tools)
+
+async def _single_flight(app: FastAPI, agent: Agent, req: ChatRequest) -> str:
+    """Run identical concurrent requests (retries, duplicate tabs) as one model turn."""
+    key = (id(agent), req.message, req.use_tools)
+    inflight = app.state.inflight
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_run_chat(app, agent, req))
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    # shield: one caller disconnecting must not cancel the turn for the others
+    return await asyncio.shield(task)
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest, request: Request, agent: Agent = Depends(get_agent)) -> ChatResponse:
     try:
-        reply = agent.chat(req.message, use_tools=req.use_tools)
+        reply = await _single_flight(request.app, agent, req)
         return ChatResponse(response=reply)
     except Exception as e:
         logger.exception("Error in /chat: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: dict) -> bytes:
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+async def _sse_chat(app: FastAPI, agent: Agent, req: ChatRequest) -> AsyncIterator[bytes]:
+    async with app.state.chat_sem:
+        # On a disconnect the cancellation lands in here; iterate_in_thread then closes the
+        # generator, and with it the Ollama stream, once the delta in progress arrives.
+        deltas = iterate_in_thread(agent.stream_chat(req.message, use_tools=req.use_tools))
+        try:
+            async for delta in deltas:
+                yield _sse({"delta": delta})
+            yield _sse({"done": True})
+        except Exception as e:
+            logger.exception("Error in /chat/stream: %s", e)
+            yield _sse({"error": str(e)})
+        finally:
+            await deltas.aclose()
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, request: Request, agent: Agent = Depends(get_agent)) -> StreamingResponse:
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_sse_chat(request.app, agent, req), media_type="text/event-stream", headers=headers)
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(
+    req: ChatBatchRequest, request: Request, agent: Agent = Depends(get_agent)
+) -> ChatBatchResponse:
+    runs = (_run_chat(request.app, agent, item) for item in req.items)
+    results = await asyncio.gather(*runs, return_exceptions=True)
+    responses: List[str] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            # One failed item must not fail the whole batch
+            logger.error("Error in /chat/batch item: %s", result, exc_info=result)
+            responses.append(orjson.dumps({"error": str(result)}).decode())
+        else:
+            responses.append(result)
+    return ChatBatchResponse(responses=responses)
+
 @app.get("/tools")
-def list_tools() -> dict:
-    tools_info = []
-    for tool in agent.tools.values():
-        tools_info.append(
-            {"name": tool.name, "description": tool.description, "input_schema": tool.input_schema}
-        )
-    return {"tools": tools_info}
+async def list_tools(request: Request, agent: Agent = Depends(get_agent)) -> Response:
+    state = request.app.state
+    if state.tools_cache[0] is not agent:  # a different agent was injected
+        state.tools_cache = _tools_cache(agent)
+    _, body, etag = state.tools_cache
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/healthz", response_class=PlainTextResponse)
+async def healthz() -> PlainTextResponse:
+    # Liveness only: the process is up and serving. async keeps it off the threadpool.
+    return PlainTextResponse("ok")
+
+def _ollama_reachable(session: Any) -> bool:
+    try:
+        resp = session.get(f"{OLLAMA_HOST}/api/tags", timeout=2)
+    except Exception:
+        return False
+    return resp.ok
+
+@app.get("/readyz", response_class=PlainTextResponse)
+async def readyz(request: Request) -> PlainTextResponse:
+    # Ready while Ollama answers, so a load balancer stops routing here when it is down
+    state = request.app.state
+    checked_at, ok = state.ready
+    now = time.monotonic()
+    if now - checked_at >= READY_CACHE_TTL:
+        ok = await asyncio.to_thread(_ollama_reachable, state.http)
+        state.ready = (now, ok)
+    if ok:
+        return PlainTextResponse("ok")
+    return PlainTextResponse("ollama unavailable", status_code=503)
+
+class HealthResponse(BaseModel):
+    status: str
+    model: str
+    ollama_host: str
+    ollama_num_parallel: int
+    ollama_max_loaded_models: int
+    ollama_keep_alive: Optional[Union[int, str]]
+    chat_concurrency: int
+
+class RootResponse(BaseModel):
+    message: str
+
+@app.get("/health", response_model=HealthResponse)
+def health() -> HealthResponse:
+    return HealthResponse(
+        status="ok",
+        model=MODEL_NAME,
+        ollama_host=OLLAMA_HOST,
+        ollama_num_parallel=OLLAMA_NUM_PARALLEL,
+        ollama_max_loaded_models=OLLAMA_MAX_LOADED_MODELS,
+        ollama_keep_alive=OLLAMA_KEEP_ALIVE,
+        chat_concurrency=CHAT_CONCURRENCY,
+    )
 
-@app.get("/")
-def root() -> dict:
-    return {"message": "Local Qwen Agent API. Open /web for UI."}
+@app.get("/", response_model=RootResponse)
+def root() -> RootResponse:
+    return RootResponse(message="Local Qwen Agent API. Open /web for UI.")
 
 app.mount("/web", StaticFiles(directory="server/web", html=True), name="web")
@@ -0,0 +1,51 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def config_cache_dir(tmp_path_factory):
+    """Keep the agent's tools-config caches out of the real user cache dir."""
+    cache_dir = tmp_path_factory.mktemp("cache")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("XDG_CACHE_HOME", str(cache_dir))
+        yield cache_dir
+
+
+@pytest.fixture(scope="session")
+def sample_repo(tmp_path_factory):
+    """A small repository built once per session; tests must treat it as read-only."""
+    root = tmp_path_factory.mktemp("repo")
+    (root / "hello.txt").write_text("Hello world")
+    (root / "a.txt").write_text("foo bar\nhello world")
+    (root / "b.md").write_text("another foo line\nno match")
+    return root
+
+
+@pytest.fixture(scope="session")
+def sample_config(tmp_path_factory):
+    """Tool configs and a dummy tool module, kept apart from the ``sample_repo`` corpus."""
+    root = tmp_path_factory.mktemp("config")
+    (root / "tools.yaml").write_text("tools: []\n")
+    (root / "dummy_tools.yaml").write_text(
+        """
+tools:
+  - name: dummy
+    module: sample_dummy_tool
+    class: DummyTool
+    description: Dummy tool
+"""
+    )
+    (root / "sample_dummy_tool.py").write_text(
+        """
+class DummyTool:
+    name = 'dummy'
+    description = 'dummy'
+    input_schema = {}
+    def run(self, **kwargs):
+        return {'ran': True, 'args': kwargs}
+"""
+    )
+    return root
@@ -1,14 +1,23 @@
 """
 Integration tests for the FastAPI server.
 
-These tests override the agent's backend to avoid calling a real model.
+These tests inject agents with dummy backends through FastAPI's dependency overrides
+to avoid calling a real model.
 """
 
+import asyncio
 import json
+import threading
+import time
+from types import SimpleNamespace
 
+import pytest
 from fastapi.testclient import TestClient
 
 import server.api as api
+from agent import Agent
+
+TOOLS_CONFIG = "agent/config/tools.yaml"
 
 
 class DummyBackend:
@@ -16,25 +25,216 @@ class DummyBackend:
         return "dummy response"
 
 
-def test_chat_endpoint(monkeypatch):
-    # Override backend and agent backend with dummy
-    dummy = DummyBackend()
-    monkeypatch.setattr(api, "backend", dummy)
-    monkeypatch.setattr(api, "agent", api.Agent(backend=dummy, tools_config="agent/config/tools.yaml"))
+@pytest.fixture(scope="module")
+def client():
+    # One app startup for the whole module; warmup would try to reach a real Ollama
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(api, "WARMUP", False)
+        with TestClient(api.app) as client:
+            yield client
+
+
+@pytest.fixture(scope="module")
+def dummy_agent():
+    return Agent(backend=DummyBackend(), tools_config=TOOLS_CONFIG)
+
+
+@pytest.fixture
+def use_agent(client):
+    def use(agent):
+        api.app.dependency_overrides[api.get_agent] = lambda: agent
+        return agent
+
+    yield use
+    api.app.dependency_overrides.pop(api.get_agent, None)
+
 
-    client = TestClient(api.app)
+def test_chat_endpoint(client, use_agent, dummy_agent):
+    use_agent(dummy_agent)
     resp = client.post("/chat", json={"message": "hello", "use_tools": False})
     assert resp.status_code == 200
     data = resp.json()
     assert data["response"] == "dummy response"
 
 
-def test_tools_endpoint(monkeypatch):
-    dummy = DummyBackend()
-    monkeypatch.setattr(api, "backend", dummy)
-    monkeypatch.setattr(api, "agent", api.Agent(backend=dummy, tools_config="agent/config/tools.yaml"))
-    client = TestClient(api.app)
+def test_chat_rejects_unknown_fields(client, use_agent, dummy_agent):
+    use_agent(dummy_agent)
+    resp = client.post("/chat", json={"message": "hello", "stream": True})
+    assert resp.status_code == 422
+
+
+def test_chat_response_compression(client, use_agent):
+    class LongBackend:
+        def generate(self, prompt, history, system_prompt=None, model=None):
+            return "x" * int(prompt)
+
+    use_agent(Agent(backend=LongBackend(), tools_config=None))
+    resp = client.post("/chat", json={"message": "4096"}, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.json()["response"] == "x" * 4096
+    resp = client.post("/chat", json={"message": "16"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+
+
+def test_tools_endpoint(client, use_agent, dummy_agent):
+    use_agent(dummy_agent)
     resp = client.get("/tools")
     assert resp.status_code == 200
     data = resp.json()
-    assert isinstance(data.get("tools"), list)
\ No newline at end of file
+    assert isinstance(data.get("tools"), list)
+    assert resp.headers["cache-control"].startswith("public")
+
+
+def test_tools_endpoint_not_modified(client, use_agent, dummy_agent):
+    use_agent(dummy_agent)
+    etag = client.get("/tools").headers["etag"]
+    resp = client.get("/tools", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+
+def test_tools_endpoint_follows_injected_agent(client, use_agent, dummy_agent):
+    use_agent(dummy_agent)
+    etag = client.get("/tools").headers["etag"]
+    bare = Agent(backend=DummyBackend(), tools_config=TOOLS_CONFIG)
+    bare.tools = {}
+    use_agent(bare)
+    resp = client.get("/tools", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json() == {"tools": []}
+
+
+def test_chat_batch_endpoint(client, use_agent):
+    class FlakyBackend:
+        def generate(self, prompt, history, system_prompt=None, model=None):
+            if prompt == "boom":
+                raise RuntimeError("backend down")
+            return f"reply to {prompt}"
+
+    use_agent(Agent(backend=FlakyBackend(), tools_config=TOOLS_CONFIG))
+    items = [{"message": "a"}, {"message": "boom"}, {"message": "b"}]
+    resp = client.post("/chat/batch", json={"items": items})
+    assert resp.status_code == 200
+    responses = resp.json()["responses"]
+    assert responses[0] == "reply to a"
+    assert json.loads(responses[1]) == {"error": "backend down"}
+    assert responses[2] == "reply to b"
+
+
+def test_ollama_host_normalization():
+    assert api._ollama_url("127.0.0.1") == "http://127.0.0.1:11434"
+    assert api._ollama_url("example.com:8080") == "http://example.com:8080"
+    assert api._ollama_url("https://ollama.example.com/") == "https://ollama.example.com"
+
+
+def test_chat_stream_endpoint(client, use_agent):
+    class StreamBackend(DummyBackend):
+        def generate_stream(self, prompt, history, system_prompt=None, model=None):
+            yield from ["dummy ", "stream"]
+
+    use_agent(Agent(backend=StreamBackend(), tools_config=TOOLS_CONFIG))
+    resp = client.post("/chat/stream", json={"message": "hello"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in resp.text.split("\n\n") if line]
+    assert events == [{"delta": "dummy "}, {"delta": "stream"}, {"done": True}]
+
+
+def test_chat_single_flight(monkeypatch):
+    calls = []
+
+    async def fake_run_chat(app, agent, req):
+        calls.append(req.message)
+        await asyncio.sleep(0.01)
+        return f"reply to {req.message}"
+
+    monkeypatch.setattr(api, "_run_chat", fake_run_chat)
+    app = SimpleNamespace(state=SimpleNamespace(inflight={}))
+
+    async def main():
+        same = api.ChatRequest(message="same")
+        other = api.ChatRequest(message="other")
+        agent = object()
+        return await asyncio.gather(
+            api._single_flight(app, agent, same),
+            api._single_flight(app, agent, same),
+            api._single_flight(app, agent, other),
+        )
+
+    assert asyncio.run(main()) == ["reply to same", "reply to same", "reply to other"]
+    assert calls == ["same", "other"]
+    assert app.state.inflight == {}
+
+
+def test_cors_preflight(client):
+    headers = {
+        "Origin": "http://localhost",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "content-type",
+    }
+    resp = client.options("/chat", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["access-control-allow-origin"] == "http://localhost"
+    headers["Access-Control-Request-Method"] = "DELETE"
+    assert client.options("/chat", headers=headers).status_code == 400
+
+
+def test_health_probes(client, monkeypatch):
+    calls = []
+
+    class FakeSession:
+        ok = True
+
+        def get(self, url, timeout=None):
+            calls.append(url)
+            return SimpleNamespace(ok=self.ok)
+
+    session = FakeSession()
+    monkeypatch.setattr(api.app.state, "http", session)
+    monkeypatch.setattr(api.app.state, "ready", (float("-inf"), False))
+
+    resp = client.get("/healthz")
+    assert resp.status_code == 200 and resp.text == "ok"
+
+    assert client.get("/readyz").status_code == 200
+    session.ok = False
+    assert client.get("/readyz").status_code == 200  # cached
+    assert calls == [f"{api.OLLAMA_HOST}/api/tags"]
+
+    monkeypatch.setattr(api, "READY_CACHE_TTL", 0)
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert len(calls) == 2
+
+
+def test_chat_stream_disconnect_closes_model_stream():
+    closed = threading.Event()
+
+    class SlowStreamBackend(DummyBackend):
+        def generate_stream(self, prompt, history, system_prompt=None, model=None):
+            try:
+                for i in range(100):
+                    time.sleep(0.05)
+                    yield f"{i} "
+            finally:
+                closed.set()
+
+    agent = Agent(backend=SlowStreamBackend(), tools_config=None)
+    app = SimpleNamespace(state=SimpleNamespace(chat_sem=asyncio.Semaphore(1)))
+
+    async def main():
+        events = api._sse_chat(app, agent, api.ChatRequest(message="hello"))
+        first = await events.__anext__()
+        # The client goes away while the next delta is still being generated
+        pending = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
+        # The stream must be closed while the app keeps running, not only at garbage collection
+        return first, await asyncio.to_thread(closed.wait, 1)
+
+    first, stream_closed = asyncio.run(main())
+    assert first == api._sse({"delta": "0 "})
+    assert stream_closed
+    assert agent.history == []
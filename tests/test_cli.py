@@ -0,0 +1,147 @@
+"""
+Tests for the CLI agent daemon.
+"""
+
+import asyncio
+import threading
+import time
+
+import orjson
+import pytest
+
+from agent.core import Agent
+import cli.daemon as daemon
+from cli.daemon import DaemonClient, serve, stream_local
+
+
+class StreamBackend:
+    def generate(self, prompt, history, system_prompt=None, model=None):
+        return f"echo: {prompt}"
+
+    def generate_stream(self, prompt, history, system_prompt=None, model=None):
+        yield "echo: "
+        yield prompt
+
+
+def test_daemon_round_trip(tmp_path):
+    config = tmp_path / "tools.yaml"
+    config.write_text("tools: []\n")
+    agent = Agent(backend=StreamBackend(), tools_config=str(config))
+    sock = str(tmp_path / "agent.sock")
+
+    async def main():
+        server = asyncio.create_task(serve(agent, sock))
+        for _ in range(100):
+            client = await DaemonClient.connect(sock)
+            if client is not None:
+                break
+            await asyncio.sleep(0.01)
+        try:
+            first = [delta async for delta in client.chat("hello", False)]
+            second = [delta async for delta in client.chat("again", False)]
+            with pytest.raises(RuntimeError):
+                await serve(agent, sock)  # a second daemon must not steal the socket
+            # Malformed requests get an error line and the connection stays usable
+            client._writer.write(b'{"use_tools": false}\nnot json\n')
+            bad = [orjson.loads(await client._reader.readline()) for _ in range(2)]
+            third = [delta async for delta in client.chat("still here", False)]
+        finally:
+            await client.close()
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+        return first, second, bad, third
+
+    first, second, bad, third = asyncio.run(main())
+    assert "".join(first) == "echo: hello"
+    assert "".join(second) == "echo: again"
+    assert all("Bad request" in event["error"] for event in bad)
+    assert "".join(third) == "echo: still here"
+    assert len(agent.history) == 6
+
+
+def test_stream_local_cancel_is_immediate_and_closes_stream():
+    closed = threading.Event()
+
+    class SlowBackend(StreamBackend):
+        def generate_stream(self, prompt, history, system_prompt=None, model=None):
+            try:
+                yield "first "
+                time.sleep(0.5)
+                yield "second"
+            finally:
+                closed.set()
+
+    agent = Agent(backend=SlowBackend(), tools_config=None)
+
+    async def main():
+        async def consume():
+            async for _ in stream_local(agent, "hello", False):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)  # the worker is now blocked inside the slow chunk
+        started = time.monotonic()
+        task.cancel()  # what Ctrl+C does to the running turn
+        await asyncio.gather(task, return_exceptions=True)
+        cancel_time = time.monotonic() - started
+        return cancel_time, await asyncio.to_thread(closed.wait, 2)
+
+    cancel_time, stream_closed = asyncio.run(main())
+    assert cancel_time < 0.2
+    assert stream_closed
+
+
+async def _start_daemon(agent, sock):
+    server = asyncio.create_task(serve(agent, sock))
+    for _ in range(100):
+        client = await DaemonClient.connect(sock)
+        if client is not None:
+            return server, client
+        await asyncio.sleep(0.01)
+    raise AssertionError("daemon did not start")
+
+
+def test_daemon_large_payloads(tmp_path):
+    agent = Agent(backend=StreamBackend(), tools_config=None)
+    message = "x" * 100_000  # well over asyncio's default 64 KiB line limit
+
+    async def main():
+        server, client = await _start_daemon(agent, str(tmp_path / "agent.sock"))
+        try:
+            # Tool turns arrive as one delta too, as large as the tool result
+            tool_reply = "".join([d async for d in client.chat(message, True)])
+            return tool_reply, "".join([d async for d in client.chat(message, False)])
+        finally:
+            await client.close()
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+
+    tool_reply, reply = asyncio.run(main())
+    assert tool_reply == reply == "echo: " + message
+
+
+def test_daemon_rejects_oversized_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, "LINE_LIMIT", 1024)
+    monkeypatch.setattr(daemon, "_MAX_DELTA_CHARS", 100)
+    agent = Agent(backend=StreamBackend(), tools_config=None)
+
+    async def main():
+        server, client = await _start_daemon(agent, str(tmp_path / "agent.sock"))
+        try:
+            with pytest.raises(ValueError):
+                [d async for d in client.chat("y" * 2000, False)]
+            # A line over the limit (bypassing the client check) gets an error reply...
+            client._writer.write(orjson.dumps({"message": "y" * 5000}) + b"\n")
+            error = orjson.loads(await client._reader.readline())
+            # ...and the connection stays usable; long replies arrive in small deltas
+            deltas = [d async for d in client.chat("z" * 900, False)]
+            return error, deltas
+        finally:
+            await client.close()
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+
+    error, deltas = asyncio.run(main())
+    assert "line limit" in error["error"]
+    assert "".join(deltas) == "echo: " + "z" * 900
+    assert max(len(d) for d in deltas) <= 100
@@ -14,44 +14,19 @@ class DummyBackend:
         return f"echo: {prompt}"
 
 
-def test_agent_chat_no_tools(tmp_path):
+def test_agent_chat_no_tools(sample_config):
     # Use a dummy tools config with no tools
-    config = tmp_path / "tools.yaml"
-    config.write_text("tools: []\n")
+    config = sample_config / "tools.yaml"
     backend = DummyBackend()
     agent = Agent(backend=backend, tools_config=str(config))
     reply = agent.chat("hello", use_tools=False)
     assert reply == "echo: hello"
 
 
-def test_agent_chat_with_tools(tmp_path):
-    # Use dummy tool config and dummy backend that returns JSON to trigger tool call
-    tools_yaml = tmp_path / "tools.yaml"
-    # Create a simple tool that returns args
-    tools_yaml.write_text(
-        """
-tools:
-  - name: dummy
-    module: tests.dummy_tool
-    class: DummyTool
-    description: Dummy tool
-"""
-    )
-    # Create dummy tool module in tmp path
-    dummy_tool_py = tmp_path / "tests" / "dummy_tool.py"
-    dummy_tool_py.parent.mkdir(exist_ok=True)
-    dummy_tool_py.write_text(
-        """
-class DummyTool:
-    name = 'dummy'
-    description = 'dummy'
-    input_schema = {}
-    def run(self, **kwargs):
-        return {'ran': True, 'args': kwargs}
-"""
-    )
-    import sys
-    sys.path.insert(0, str(tmp_path))
+def test_agent_chat_with_tools(sample_config, monkeypatch):
+    # sample_config holds a dummy tool module and a config that registers it;
+    # syspath_prepend makes it importable and is undone after the test
+    monkeypatch.syspath_prepend(str(sample_config))
 
     class JsonBackend:
         def __init__(self):
@@ -61,6 +36,104 @@ class DummyTool:
             return '{"tool": {"name": "dummy", "args": {"x": 1}}}'
 
     backend = JsonBackend()
-    agent = Agent(backend=backend, tools_config=str(tools_yaml))
+    agent = Agent(backend=backend, tools_config=str(sample_config / "dummy_tools.yaml"))
     reply = agent.chat("test", use_tools=True)
-    assert reply == '{"ran": true, "args": {"x": 1}}'
\ No newline at end of file
+    assert reply == '{"ran":true,"args":{"x":1}}'
+
+def test_agent_stream_stops_after_tool_call(sample_config):
+    config = sample_config / "tools.yaml"
+
+    class StreamBackend:
+        def __init__(self):
+            self.consumed = []
+
+        def generate(self, prompt, history, system_prompt=None, model=None):
+            raise AssertionError("streaming backend should be used")
+
+        def generate_stream(self, prompt, history, system_prompt=None, model=None):
+            for chunk in ['{"tool": {"name": "missing", ', '"args": {}}}', "\nand some trailing prose"]:
+                self.consumed.append(chunk)
+                yield chunk
+
+    backend = StreamBackend()
+    agent = Agent(backend=backend, tools_config=str(config))
+    reply = agent.chat("test", use_tools=True)
+    assert reply == '{"error":"Unknown tool: missing"}'
+    assert len(backend.consumed) == 2
+
+
+def test_extract_tool_call_from_prose(sample_config):
+    config = sample_config / "tools.yaml"
+    agent = Agent(backend=DummyBackend(), tools_config=str(config))
+    text = 'Use {braces} like this: {"tool": {"name": "x", "args": {"q": "a}\\"b"}}} and done }'
+    assert agent._try_extract_tool_call(text) == {"tool": {"name": "x", "args": {"q": 'a}"b'}}}
+    assert agent._try_extract_tool_call("just prose") is None
+    assert agent._try_extract_tool_call('{"tool": {"name": "x"') is None
+
+
+def test_agent_history_is_bounded(sample_config):
+    config = sample_config / "tools.yaml"
+    agent = Agent(backend=DummyBackend(), tools_config=str(config), max_history=4)
+    for i in range(5):
+        agent.chat(f"msg {i}")
+    assert [m["content"] for m in agent.history] == ["msg 3", "echo: msg 3", "msg 4", "echo: msg 4"]
+
+
+def test_tools_config_cache_tracks_yaml_changes(tmp_path, config_cache_dir):
+    import os
+
+    config = tmp_path / "tools.yaml"
+    config.write_text("tools: []\n")
+    Agent(backend=DummyBackend(), tools_config=str(config))
+    # The cache lives in the user cache dir, not in the repository file_search scans
+    assert os.listdir(tmp_path) == ["tools.yaml"]
+    assert (config_cache_dir / "local_agent").is_dir()
+
+    mtime_ns = config.stat().st_mtime_ns
+    config.write_text(
+        """
+tools:
+  - name: logger
+    module: agent.tools.logger
+    class: LoggerTool
+"""
+    )
+    os.utime(config, ns=(mtime_ns, mtime_ns))  # an edit within the same clock tick
+    agent = Agent(backend=DummyBackend(), tools_config=str(config))
+    assert list(agent.tools) == ["logger"]
+
+
+def test_agent_without_tools_config():
+    agent = Agent(backend=DummyBackend(), tools_config=None)
+    assert agent.tools == {}
+    assert agent.chat("hello", use_tools=True) == "echo: hello"
+
+
+def test_agent_history_trims_whole_turns():
+    agent = Agent(backend=DummyBackend(), tools_config=None, max_history=3)
+    agent.chat("one")
+    agent.chat("two")
+    assert [m["role"] for m in agent.history] == ["user", "assistant"]
+    assert agent.history[0]["content"] == "two"
+
+
+def test_agent_history_trim_is_thread_safe():
+    from concurrent.futures import ThreadPoolExecutor
+
+    agent = Agent(backend=DummyBackend(), tools_config=None, max_history=4)
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(lambda i: agent.chat(f"msg {i}"), range(400)))
+    assert len(agent.history) == 4
+    assert [m["role"] for m in agent.history] == ["user", "assistant", "user", "assistant"]
+
+
+def test_tools_config_cache_is_not_searchable(tmp_path):
+    from agent.tools.file_search import FileSearchTool
+
+    config = tmp_path / "tools.yaml"
+    config.write_text("tools:\n  - name: logger\n    module: agent.tools.logger\n    class: LoggerTool\n")
+    Agent(backend=DummyBackend(), tools_config=str(config))
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    result = search_tool.run(query="agent.tools.logger")
+    assert [m["file"] for m in result["matches"]] == ["tools.yaml"]
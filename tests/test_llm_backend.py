@@ -0,0 +1,48 @@
+"""
+Tests for the Ollama backend request encoding.
+"""
+
+import orjson
+import pytest
+
+from agent import llm_backend
+from agent.llm_backend import OllamaBackend, _parse_reply
+
+
+def test_encode_payload_reuses_system_message():
+    backend = OllamaBackend(model="test-model")
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    payload = orjson.loads(backend._encode_payload("next", history, "system text", None, stream=False))
+    assert payload == {
+        "model": "test-model",
+        "stream": False,
+        "messages": [{"role": "system", "content": "system text"}, *history, {"role": "user", "content": "next"}],
+    }
+    encoded = backend._system_cache[1]
+    backend._encode_payload("again", [], "system text", None, stream=True)
+    assert backend._system_cache[1] is encoded
+    backend.close()
+
+
+def test_encode_payload_reuses_history_encoding():
+    backend = OllamaBackend(model="test-model")
+    history = [{"role": "user", "content": "hi"}]
+    backend._encode_payload("a", history, None, None, stream=False)
+    cached = backend._message_cache[("user", "hi")]
+    backend._encode_payload("b", history, None, None, stream=False)
+    assert backend._message_cache[("user", "hi")] is cached
+    backend._encode_payload("c", [], None, None, stream=False)
+    assert backend._message_cache == {}
+    backend.close()
+
+
+@pytest.mark.parametrize("decoder", ["msgspec", "orjson"])
+def test_parse_reply_extracts_content(decoder, monkeypatch):
+    if decoder == "msgspec":
+        if llm_backend.msgspec is None:
+            pytest.skip("msgspec is not installed")
+    else:
+        monkeypatch.setattr(llm_backend, "msgspec", None)
+    raw = b'{"model":"m","created_at":"t","message":{"role":"assistant","content":"hi"},"done":true,"total_duration":5}'
+    assert _parse_reply(raw) == ("hi", True, None)
+    assert _parse_reply(b'{"error":"model not found"}') == (None, False, "model not found")
@@ -3,29 +3,25 @@ Unit tests for agent tools.
 """
 
 import os
+import shutil
 import tempfile
 
+import pytest
+
 from agent.tools.file_reader import FileReaderTool
 from agent.tools.file_search import FileSearchTool
 from agent.tools.logger import LoggerTool
 
 
-def test_file_reader(tmp_path):
-    # Create a temporary file
-    file_path = tmp_path / "hello.txt"
-    content = "Hello world"
-    file_path.write_text(content)
-    reader = FileReaderTool(repo_root=str(tmp_path))
+def test_file_reader(sample_repo):
+    reader = FileReaderTool(repo_root=str(sample_repo))
     result = reader.run(path="hello.txt")
-    assert result["content"] == content
+    assert result["content"] == "Hello world"
     assert not result["truncated"]
 
 
-def test_file_search(tmp_path):
-    # Create files
-    (tmp_path / "a.txt").write_text("foo bar\nhello world")
-    (tmp_path / "b.md").write_text("another foo line\nno match")
-    search_tool = FileSearchTool(repo_root=str(tmp_path))
+def test_file_search(sample_repo):
+    search_tool = FileSearchTool(repo_root=str(sample_repo))
     result = search_tool.run(query="foo", max_results=10)
     matches = result["matches"]
     assert len(matches) == 2
@@ -39,4 +35,145 @@ def test_logger(tmp_path):
     notes_file = tmp_path / result["path"]
     assert notes_file.exists()
     contents = notes_file.read_text()
-    assert note in contents
\ No newline at end of file
+    assert note in contents
+
+def test_file_search_line_numbers(tmp_path):
+    (tmp_path / "a.py").write_text("foo\nbar\n\nFOO and foo\nbaz foo")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None  # exercise the pure-Python scanner
+    result = search_tool.run(query="foo")
+    assert [(m["line"], m["text"]) for m in result["matches"]] == [(1, "foo"), (4, "FOO and foo"), (5, "baz foo")]
+
+
+def test_file_search_skips_binary(tmp_path):
+    (tmp_path / "data.json").write_bytes(b"\x00\x01foo\x00")
+    (tmp_path / "text.txt").write_text("foo")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    result = search_tool.run(query="foo")
+    assert [m["file"] for m in result["matches"]] == ["text.txt"]
+
+
+def test_file_reader_rejects_sibling_directory(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    sibling = tmp_path / "repo-evil"
+    sibling.mkdir()
+    (sibling / "secret.txt").write_text("secret")
+    reader = FileReaderTool(repo_root=str(repo))
+    with pytest.raises(ValueError):
+        reader.run(path="../repo-evil/secret.txt")
+
+
+def test_tool_json_descriptor(sample_repo):
+    import orjson
+
+    reader = FileReaderTool(repo_root=str(sample_repo))
+    descriptor = orjson.loads(reader.json_descriptor)
+    assert descriptor["name"] == "file_reader"
+    assert descriptor["input_schema"] == FileReaderTool.input_schema
+    assert reader.json_descriptor is reader.json_descriptor
+
+
+def test_file_search_falls_back_when_rg_rejects_pattern(tmp_path):
+    (tmp_path / "a.txt").write_text("foobar\nfoobaz")
+    fake_rg = tmp_path / "bin" / "rg"
+    fake_rg.parent.mkdir()
+    fake_rg.write_text("#!/bin/sh\necho 'regex parse error' >&2\nexit 2\n")
+    fake_rg.chmod(0o755)
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = str(fake_rg)
+    result = search_tool.run(query="foo(?=bar)", regex=True)
+    assert [(m["file"], m["line"]) for m in result["matches"]] == [("a.txt", 1)]
+
+
+def test_file_search_walks_in_path_order(tmp_path):
+    for rel in ["b.txt", "a/z.txt", "a/b/c.txt", "c.txt"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("foo")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    files = [m["file"] for m in search_tool.run(query="foo")["matches"]]
+    assert files == [os.path.join("a", "b", "c.txt"), os.path.join("a", "z.txt"), "b.txt", "c.txt"]
+
+
+@pytest.mark.skipif(shutil.which("rg") is None, reason="ripgrep is not installed")
+def test_file_search_rg_matches_python_scanner(tmp_path):
+    for i in range(20):
+        (tmp_path / f"d{i % 3}" / f"f{i:02}.txt").parent.mkdir(exist_ok=True)
+        (tmp_path / f"d{i % 3}" / f"f{i:02}.txt").write_text("foobar\nfoo\n")
+    rg_tool = FileSearchTool(repo_root=str(tmp_path))
+    py_tool = FileSearchTool(repo_root=str(tmp_path))
+    py_tool._rg = None
+    for query, regex in [("foo", False), ("foo(?=bar)", True)]:
+        assert rg_tool.run(query=query, regex=regex, max_results=7) == py_tool.run(
+            query=query, regex=regex, max_results=7
+        )
+
+
+def test_file_search_non_ascii_ignores_case(tmp_path):
+    (tmp_path / "notes.md").write_text("Запуск сервера\nостановка", encoding="utf-8")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    result = search_tool.run(query="запуск")
+    assert [(m["line"], m["text"]) for m in result["matches"]] == [(1, "Запуск сервера")]
+
+
+def test_file_search_regex_stays_within_a_line(tmp_path):
+    (tmp_path / "a.txt").write_text("foo\n bar\nfoo  bar\nfoo\n")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    result = search_tool.run(query=r"foo\s+bar", regex=True)
+    assert [(m["line"], m["text"]) for m in result["matches"]] == [(3, "foo  bar")]
+    result = search_tool.run(query=r"foo\s*", regex=True)
+    assert [m["line"] for m in result["matches"]] == [1, 3, 4]
+
+
+def test_file_search_stops_walking_at_max_results(tmp_path):
+    for i in range(200):
+        (tmp_path / f"f{i:03}.txt").write_text("foo\n")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    walked = []
+    iter_candidates = search_tool._iter_candidates
+
+    def counting_candidates():
+        for candidate in iter_candidates():
+            walked.append(candidate)
+            yield candidate
+
+    search_tool._iter_candidates = counting_candidates
+    result = search_tool.run(query="foo", max_results=3)
+    assert result["truncated"] and len(result["matches"]) == 3
+    assert len(walked) <= 3 + 2 * FileSearchTool._MAX_WORKERS
+
+
+def test_file_search_ascii_regex_on_non_ascii_text(tmp_path):
+    (tmp_path / "a.txt").write_text("café ok\nnaïve\n", encoding="utf-8")
+    search_tool = FileSearchTool(repo_root=str(tmp_path))
+    search_tool._rg = None
+    for query, line in [(r"caf.\s", 1), (r"\bcaf\w\b", 1), (r"na\w+ve", 2), (r"^\w+$", 2)]:
+        result = search_tool.run(query=query, regex=True)
+        assert [m["line"] for m in result["matches"]] == [line], query
+
+
+def test_file_reader_whole_file_and_newlines(tmp_path):
+    (tmp_path / "dos.txt").write_bytes(b"one\r\ntwo\rthree\n" * 3)
+    reader = FileReaderTool(repo_root=str(tmp_path))
+    result = reader.run(path="dos.txt", max_chars=-1)
+    assert result == {"content": "one\ntwo\nthree\n" * 3, "truncated": False}
+    assert reader.run(path="dos.txt", max_chars=8)["content"] == "one\ntwo\n"
+
+
+def test_logger_reopens_deleted_or_rotated_notes(tmp_path):
+    logger_tool = LoggerTool(repo_root=str(tmp_path))
+    notes_file = tmp_path / "notes.txt"
+    logger_tool.run(note="first")
+    notes_file.unlink()
+    logger_tool.run(note="after delete")
+    assert "after delete" in notes_file.read_text()
+    notes_file.rename(tmp_path / "notes.txt.1")
+    logger_tool.run(note="after rotate")
+    assert "after rotate" in notes_file.read_text()
+    assert "after rotate" not in (tmp_path / "notes.txt.1").read_text()
+    logger_tool.close()